@@ -1,10 +1,13 @@
 from __future__ import annotations
 
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import asdict
 from typing import Any, Dict, Tuple, List
+import json
 import os
-import time
-from io import BytesIO
-from PIL import Image, ImageDraw
+
+import numpy as np
+from PIL import Image
 
 from langgraph.graph import END, StateGraph
 
@@ -14,9 +17,62 @@ from tools.extractor import ReleaseExtractor
 from tools.validator import Validator
 from tools.vision import Action, VisionClient
 from utils.logging import log_event
-from utils.bbox_guards import bbox_in_valid_column, blue_ratio
+from utils.bbox_guards import ScreenshotFeatures, make_column_guard
 from utils.trace import TraceWriter
 
+_STATE_FIELDS = tuple(AgentState.model_fields)
+
+# Screenshot bytes and their decoded features, keyed by the step they were
+# observed at (AgentState.last_png_ref). Keeping them out of the state saves
+# LangGraph from carrying the image through every node; only the last couple
+# of steps are kept.
+_img_cache: Dict[int, Tuple[bytes, ScreenshotFeatures]] = {}
+_IMG_CACHE_KEEP = 2
+
+# Bbox overlays and rejection dumps are encoded and written off the agent loop
+# (TraceWriter queues its own writes); call flush_io() before tearing down.
+_io_pool = ThreadPoolExecutor(max_workers=2)
+_pending_io: List[Future] = []
+
+
+class _Services:
+    browser: BrowserSession
+    vision: VisionClient
+    validator: Validator
+    extractor: ReleaseExtractor
+    tracer: TraceWriter
+    logger: Any
+
+    def bind(
+        self,
+        browser: BrowserSession,
+        vision: VisionClient,
+        validator: Validator,
+        extractor: ReleaseExtractor,
+        tracer: TraceWriter,
+        logger,
+    ) -> None:
+        self.browser = browser
+        self.vision = vision
+        self.validator = validator
+        self.extractor = extractor
+        self.tracer = tracer
+        self.logger = logger
+
+
+_services = _Services()
+
+# Stages whose next few actions are predictable from one screenshot; the VLM
+# may return a short plan there, executed without re-prompting until
+# validation sees something unexpected. Only keyboard steps are queued: a bbox
+# was picked on the pre-action screenshot and may be stale once the page moves.
+_PLAN_STAGES = (Stage.HOME,)
+_MAX_PLAN_STEPS = 3
+_PLAN_STEP_TYPES = ("type", "press")
+
+_HOME_SHORTCUT_REASON = "home_search_shortcut"
+_compiled_graph = None
+
 
 def build_graph(
     browser: BrowserSession,
@@ -26,21 +82,30 @@ def build_graph(
     tracer: TraceWriter,
     logger,
 ):
+    # The graph topology is static, so it is compiled once per process; the
+    # nodes pick up the services bound by the most recent call.
+    global _compiled_graph
+    _services.bind(browser, vision, validator, extractor, tracer, logger)
+    if _compiled_graph is None:
+        _compiled_graph = _compile_graph()
+    return _compiled_graph
+
+
+def _compile_graph():
     graph = StateGraph(dict)
 
     def observe_node(state_dict: Dict[str, Any]) -> Dict[str, Any]:
-        state = AgentState.model_validate(state_dict)
-        obs = browser.observe()
+        state = _load_state(state_dict)
+        obs = _services.browser.observe()
         state.current_url = obs.url
         state.page_title = obs.title
-        state.last_png_bytes = obs.screenshot_png
-        state.last_png_bytes_raw = obs.screenshot_png
+        _cache_screenshot(state.step_count, obs.screenshot_vlm)
+        state.last_png_ref = state.step_count
         if state.step_count == 0 and not state.run_dir:
-            state.run_dir = tracer.run_dir
+            state.run_dir = _services.tracer.run_dir
         if state.run_dir:
-            path = tracer.save_image(state.step_count + 1, obs.screenshot_png)
-            state.last_screenshot_path = path
-            tracer.save_json(
+            state.last_screenshot_path = _services.tracer.save_image(state.step_count + 1, obs.screenshot_vlm)
+            _services.tracer.save_json(
                 state.step_count + 1,
                 "observation",
                 {
@@ -50,52 +115,73 @@ def build_graph(
                 },
             )
         state.next_node = "decide"
-        log_event(logger, "observe", url=obs.url, title=obs.title, stage=state.stage)
-        return state.model_dump()
+        log_event(_services.logger, "observe", url=obs.url, title=obs.title, stage=state.stage)
+        return _dump_state(state)
 
     def decide_node(state_dict: Dict[str, Any]) -> Dict[str, Any]:
-        state = AgentState.model_validate(state_dict)
+        state = _load_state(state_dict)
         if state.current_url and "/search" in state.current_url:
             state.stage = Stage.SEARCH_RESULTS
-        subgoal = _subgoal_for_stage(state)
-        raw = state.last_png_bytes_raw or b""
         if state.pending_candidates and state.stage == Stage.SEARCH_RESULTS:
-            action = Action.model_validate(
-                {"type": "click", "reason": "pending_candidate", "bbox": state.pending_candidates[0]["bbox"]}
-            )
-        elif state.retry_count > 0:
+            _fast_pending_click(state)
+            if state.run_dir:
+                _services.tracer.save_json(state.step_count + 1, "action", state.last_action)
+            state.next_node = "act"
+            log_event(_services.logger, "decide", subgoal="pending_candidate", action=state.last_action)
+            return _dump_state(state)
+        queued, source = None, None
+        if state.planned_actions:
+            queued, source = state.planned_actions.pop(0), "planned"
+        else:
+            queued, source = _stage_shortcut(state), "stage_shortcut"
+        if queued is not None:
+            state.last_action = queued
+            if state.run_dir:
+                _services.tracer.save_json(state.step_count + 1, "action", state.last_action)
+            state.next_node = "act"
+            log_event(_services.logger, "decide", subgoal=source, action=state.last_action)
+            return _dump_state(state)
+        subgoal = _subgoal_for_stage(state)
+        raw = _screenshot_for(state) or b""
+        allow_plan = state.stage in _PLAN_STAGES
+        if state.retry_count > 0:
             critique_goal = (
                 subgoal
                 + " The previous attempt did not change the URL. Return a corrected bbox or a new action using the current screenshot."
             )
-            action = vision.get_action(raw, critique_goal, state.stage.value)
+            action = _services.vision.get_action(raw, critique_goal, state.stage.value, allow_plan=allow_plan)
         else:
-            action = vision.get_action(raw, subgoal, state.stage.value)
-        state.last_action = action.model_dump()
+            action = _services.vision.get_action(raw, subgoal, state.stage.value, allow_plan=allow_plan)
+        state.last_action = action.model_dump(exclude={"plan"})
+        if allow_plan and action.plan:
+            state.planned_actions = _keyboard_plan(action.plan)
         if action.bbox:
             state.last_bbox = tuple(action.bbox)
-        if action.bbox and state.last_png_bytes:
-            _save_bbox_overlay(state.last_png_bytes, action.bbox, state.step_count + 1)
+        features = _features_for(state)
+        if action.bbox and features is not None:
+            _save_bbox_overlay(features.arr, action.bbox, state.step_count + 1)
         if state.run_dir:
-            tracer.save_json(state.step_count + 1, "action", state.last_action)
+            _services.tracer.save_json(state.step_count + 1, "action", state.last_action)
         state.next_node = "act"
-        log_event(logger, "decide", subgoal=subgoal, action=state.last_action)
-        return state.model_dump()
+        log_event(_services.logger, "decide", subgoal=subgoal, action=state.last_action)
+        return _dump_state(state)
 
     def act_node(state_dict: Dict[str, Any]) -> Dict[str, Any]:
-        state = AgentState.model_validate(state_dict)
+        state = _load_state(state_dict)
         action = Action.model_validate(state.last_action or {"type": "noop", "reason": "missing"})
         if state.stage == Stage.SEARCH_RESULTS and action.type == "click" and action.bbox:
-            success = _explore_click_points_multi(browser, tuple(action.bbox), state.target_repo, logger)
+            success = _explore_click_points_multi(
+                _services.browser, tuple(action.bbox), state.target_repo, _services.logger
+            )
             if success:
                 state.stage = Stage.REPO
             state.step_count += 1
             state.next_node = "validate"
-            log_event(logger, "act", action=state.last_action, step=state.step_count)
-            return state.model_dump()
-        if state.stage == Stage.SEARCH_RESULTS and state.last_png_bytes_raw:
-            img = Image.open(BytesIO(state.last_png_bytes_raw))
-            img_w, img_h = img.size
+            log_event(_services.logger, "act", action=state.last_action, step=state.step_count)
+            return _dump_state(state)
+        features = _features_for(state) if state.stage == Stage.SEARCH_RESULTS else None
+        if features is not None:
+            img_h, img_w = features.arr.shape[:2]
             candidates = []
             if action.candidates:
                 for c in action.candidates:
@@ -110,10 +196,11 @@ def build_graph(
             if candidates and action.type in ("click", "click_candidates"):
                 chosen = None
                 reject_logs = []
-                for c in candidates:
+                ratios = features.blue_ratios([tuple(c["bbox"]) for c in candidates])
+                in_valid_column = make_column_guard(img_w, img_h)
+                for c, ratio in zip(candidates, ratios.tolist()):
                     bbox = c["bbox"]
-                    in_col = bbox_in_valid_column(tuple(bbox), img_w, img_h)
-                    ratio = blue_ratio(state.last_png_bytes_raw, tuple(bbox))
+                    in_col = in_valid_column(tuple(bbox))
                     reject_logs.append(
                         {
                             "bbox": bbox,
@@ -128,44 +215,45 @@ def build_graph(
                 if not chosen:
                     state.retry_count += 1
                     if state.run_dir:
-                        rej_dir = os.path.join(state.run_dir, "rejections")
-                        os.makedirs(rej_dir, exist_ok=True)
-                        rej_path = os.path.join(rej_dir, f"step_{state.step_count + 1:02d}_rejected_action.json")
-                        with open(rej_path, "w", encoding="utf-8") as f:
-                            import json
-                            json.dump(
-                                {"action": state.last_action, "stage": state.stage, "candidates": reject_logs},
-                                f,
-                                ensure_ascii=True,
-                                indent=2,
-                            )
-                    log_event(logger, "reject", reason={"candidates": reject_logs}, step=state.step_count + 1)
+                        rej_path = os.path.join(
+                            state.run_dir, "rejections", f"step_{state.step_count + 1:02d}_rejected_action.json"
+                        )
+                        _submit_io(
+                            _write_json,
+                            rej_path,
+                            {"action": state.last_action, "stage": state.stage, "candidates": reject_logs},
+                        )
+                    log_event(_services.logger, "reject", reason={"candidates": reject_logs}, step=state.step_count + 1)
                     if state.retry_count > state.max_retries_per_stage:
                         state.stage = Stage.DONE
                         state.next_node = END
-                        return state.model_dump()
+                        return _dump_state(state)
                     state.next_node = "validate"
-                    return state.model_dump()
+                    return _dump_state(state)
                 remaining = [c for c in candidates if c["bbox"] != chosen]
                 state.pending_candidates = remaining
                 action = Action.model_validate({**action.model_dump(), "bbox": chosen, "type": "click"})
-        _execute_action(browser, action, state)
+        _execute_action(_services.browser, action, state)
         state.step_count += 1
         state.next_node = "validate"
-        log_event(logger, "act", action=state.last_action, step=state.step_count)
-        return state.model_dump()
+        log_event(_services.logger, "act", action=state.last_action, step=state.step_count)
+        return _dump_state(state)
 
     def validate_node(state_dict: Dict[str, Any]) -> Dict[str, Any]:
-        state = AgentState.model_validate(state_dict)
-        if not state.last_png_bytes:
+        state = _load_state(state_dict)
+        shot = _screenshot_for(state)
+        if not shot:
             state.next_node = "observe"
-            return state.model_dump()
-        result, img_hash = validator.assess(state, state.last_png_bytes)
-        log_event(logger, "validate", result=result.__dict__, hash=img_hash)
+            return _dump_state(state)
+        result, img_hash = _services.validator.assess(state, shot, _features_for(state))
+        log_event(_services.logger, "validate", result=asdict(result), hash=img_hash)
 
         if state.current_url and "/login" in state.current_url:
             state.next_node = "observe"
-            return state.model_dump()
+            return _dump_state(state)
+
+        if result.new_stage or result.recovery_action or not _met_expectation(state, _services.browser.page.url):
+            state.planned_actions = []
 
         if result.new_stage:
             state.stage = result.new_stage
@@ -176,17 +264,17 @@ def build_graph(
         if result.should_stop:
             state.stage = Stage.DONE
             state.next_node = END
-            return state.model_dump()
+            return _dump_state(state)
 
         if result.recovery_action:
             state.retry_count += 1
             if state.retry_count > state.max_retries_per_stage:
                 state.stage = Stage.DONE
                 state.next_node = END
-                return state.model_dump()
+                return _dump_state(state)
             state.last_action = result.recovery_action
             state.next_node = "act"
-            return state.model_dump()
+            return _dump_state(state)
 
         if (
             state.stage == Stage.SEARCH_RESULTS
@@ -199,30 +287,32 @@ def build_graph(
                 next_cand = state.pending_candidates.pop(0)
                 state.last_action = {"type": "click", "reason": "next_candidate", "bbox": next_cand["bbox"]}
                 state.next_node = "act"
-                return state.model_dump()
+                return _dump_state(state)
             state.refine_level = min(state.refine_level + 1, 2)
             state.retry_count += 1
+            state.planned_actions = []
             state.next_node = "observe"
-            return state.model_dump()
+            return _dump_state(state)
 
         if result.should_extract and state.stage == Stage.RELEASES:
             state.next_node = "extract"
-            return state.model_dump()
+            return _dump_state(state)
 
         state.next_node = "observe"
-        return state.model_dump()
+        return _dump_state(state)
 
     def extract_node(state_dict: Dict[str, Any]) -> Dict[str, Any]:
-        state = AgentState.model_validate(state_dict)
-        if not state.last_png_bytes:
+        state = _load_state(state_dict)
+        shot = _screenshot_for(state)
+        if not shot:
             state.next_node = "observe"
-            return state.model_dump()
-        release = extractor.extract(state.last_png_bytes, state.target_repo)
+            return _dump_state(state)
+        release = _services.extractor.extract(shot, state.target_repo)
         state.extracted_release = release
         state.stage = Stage.EXTRACTED
         state.next_node = END
-        log_event(logger, "extract", release=release.model_dump())
-        return state.model_dump()
+        log_event(_services.logger, "extract", release=asdict(release))
+        return _dump_state(state)
 
     graph.add_node("observe", observe_node)
     graph.add_node("decide", decide_node)
@@ -260,6 +350,94 @@ def build_graph(
     return graph.compile()
 
 
+def flush_io() -> None:
+    pending = list(_pending_io)
+    _pending_io.clear()
+    wait(pending)
+
+
+def _submit_io(fn, *args: Any) -> None:
+    _pending_io[:] = [f for f in _pending_io if not f.done()]
+    _pending_io.append(_io_pool.submit(fn, *args))
+
+
+def _write_json(path: str, payload: Dict[str, Any]) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=True, separators=(",", ":"))
+
+
+def _load_state(state_dict: Dict[str, Any]) -> AgentState:
+    # Every dict flowing through the graph was produced by _dump_state (or the
+    # initial model_dump), so skip re-validating it (and the PNG bytes) per node.
+    return AgentState.model_construct(**state_dict)
+
+
+def _dump_state(state: AgentState) -> Dict[str, Any]:
+    return {k: getattr(state, k) for k in _STATE_FIELDS}
+
+
+def _cache_screenshot(step: int, png_bytes: bytes) -> None:
+    _img_cache[step] = (png_bytes, ScreenshotFeatures(png_bytes))
+    for old in [k for k in _img_cache if k < step - _IMG_CACHE_KEEP]:
+        del _img_cache[old]
+
+
+def _screenshot_for(state: AgentState) -> bytes | None:
+    entry = _img_cache.get(state.last_png_ref) if state.last_png_ref is not None else None
+    return entry[0] if entry else None
+
+
+def _features_for(state: AgentState) -> ScreenshotFeatures | None:
+    entry = _img_cache.get(state.last_png_ref) if state.last_png_ref is not None else None
+    return entry[1] if entry else None
+
+
+def _keyboard_plan(plan: List[Action]) -> List[Dict[str, Any]]:
+    # Stop at the first step that needs coordinates; later steps depend on it.
+    steps = []
+    for p in plan[:_MAX_PLAN_STEPS]:
+        if p.bbox or p.type not in _PLAN_STEP_TYPES:
+            break
+        steps.append(p.model_dump(exclude={"plan"}))
+    return steps
+
+
+def _stage_shortcut(state: AgentState) -> Dict[str, Any] | None:
+    # On the home page the transition is always "search for the repo"; GitHub's
+    # "/" shortcut focuses the search box, so no VLM call (or selector) is
+    # needed. It is tried once per run; after that HOME is left to the VLM.
+    if state.stage != Stage.HOME or state.home_shortcut_tried:
+        return None
+    state.home_shortcut_tried = True
+    return {
+        "type": "type",
+        "reason": _HOME_SHORTCUT_REASON,
+        "focus_key": "/",
+        "text": state.target_repo,
+        "key": "Enter",
+        "expect": {"url_contains": "/search"},
+    }
+
+
+def _met_expectation(state: AgentState, url: str) -> bool:
+    # state.current_url is still the pre-action observation here, so the caller
+    # passes the live page URL.
+    expect = (state.last_action or {}).get("expect") or {}
+    url_contains = expect.get("url_contains")
+    if not url_contains or not url:
+        return True
+    return url_contains.lower() in url.lower()
+
+
+def _fast_pending_click(state: AgentState) -> None:
+    # Candidate bboxes were validated when the VLM returned them; reuse the
+    # next one directly instead of round-tripping it through Action.
+    bbox = state.pending_candidates[0]["bbox"]
+    state.last_action = {"type": "click", "reason": "pending_candidate", "bbox": bbox}
+    state.last_bbox = tuple(bbox)
+
+
 def _subgoal_for_stage(state: AgentState) -> str:
     if state.stage == Stage.HOME:
         return f"Find the search bar and search for {state.target_repo}."
@@ -292,6 +470,8 @@ def _execute_action(browser: BrowserSession, action: Action, state: AgentState)
         browser.wait_for_idle()
         return
     if action.type == "type":
+        if action.focus_key:
+            browser.press_key(action.focus_key)
         if action.bbox:
             browser.type_into_bbox(action.bbox, action.text or "")
         else:
@@ -318,33 +498,41 @@ def _execute_action(browser: BrowserSession, action: Action, state: AgentState)
     return
 
 
-def _save_bbox_overlay(png_bytes: bytes, bbox: tuple[int, int, int, int], step: int) -> None:
+def _save_bbox_overlay(frame: np.ndarray, bbox: tuple[int, int, int, int], step: int) -> None:
     os.makedirs("bbox_img", exist_ok=True)
-    img = Image.open(BytesIO(png_bytes)).convert("RGBA")
-    draw = ImageDraw.Draw(img)
-    x1, y1, x2, y2 = bbox
-    draw.rectangle([x1, y1, x2, y2], outline=(0, 255, 102, 255), width=2)
     out_path = os.path.join("bbox_img", f"step_{step:02d}_bbox.png")
-    img.save(out_path)
+    _submit_io(_write_bbox_overlay, frame, tuple(bbox), out_path)
+
+
+def _write_bbox_overlay(frame: np.ndarray, bbox: Tuple[int, int, int, int], out_path: str) -> None:
+    img = frame.copy()
+    h, w = img.shape[:2]
+    x1, y1, x2, y2 = bbox
+    x1, x2 = max(0, min(x1, w - 1)), max(0, min(x2, w - 1))
+    y1, y2 = max(0, min(y1, h - 1)), max(0, min(y2, h - 1))
+    color = (0, 255, 102)
+    img[y1 : y1 + 2, x1 : x2 + 1] = color
+    img[max(y1, y2 - 1) : y2 + 1, x1 : x2 + 1] = color
+    img[y1 : y2 + 1, x1 : x1 + 2] = color
+    img[y1 : y2 + 1, max(x1, x2 - 1) : x2 + 1] = color
+    Image.fromarray(img).save(out_path, "PNG", compress_level=1)
+
+
+_PROBE_DEDUPE_PX = 8
+_PROBE_NAV_TIMEOUT_MS = 800
+_PROBE_LOAD_TIMEOUT_MS = 3000
 
 
 def _explore_click_points_multi(
     browser: BrowserSession, bbox: Tuple[int, int, int, int], target_repo: str, logger
 ) -> bool:
-    x1, y1, x2, y2 = _clamp_bbox_to_viewport(browser, bbox)
-    if x2 <= x1 + 20 or y2 <= y1 + 20:
+    viewport = browser.page.viewport_size or {"width": 1280, "height": 720}
+    rounds = _plan_explore_rounds(bbox, viewport["width"], viewport["height"])
+    if not rounds:
         return False
 
-    rounds = []
-    rounds.append(("A", (x1, y1, x2, y2), _grid_points(x1, y1, x2, y2, xs=3, ys=2)))
-
-    bx1, by1, bx2, by2 = _shrink_top_left((x1, y1, x2, y2), 0.70)
-    rounds.append(("B", (bx1, by1, bx2, by2), _grid_points(bx1, by1, bx2, by2, xs=5, ys=2)))
-
-    cx1, cy1, cx2, cy2 = _shrink_top_left((bx1, by1, bx2, by2), 0.70)
-    rounds.append(("C", (cx1, cy1, cx2, cy2), _grid_points(cx1, cy1, cx2, cy2, xs=5, ys=2)))
-
     target_path = f"/{target_repo}".lower()
+    probed: List[Tuple[int, int]] = []
     for label, (rx1, ry1, rx2, ry2), points in rounds:
         log_event(
             logger,
@@ -354,25 +542,65 @@ def _explore_click_points_multi(
             points=points,
         )
         for (px, py) in points:
+            # The shrunken rounds overlap the earlier ones; don't re-probe a spot
+            # that already failed to navigate.
+            if any(abs(px - qx) <= _PROBE_DEDUPE_PX and abs(py - qy) <= _PROBE_DEDUPE_PX for qx, qy in probed):
+                continue
+            probed.append((px, py))
             before = browser.page.url
             browser.click_point(px, py)
-            time.sleep(0.8)
             try:
-                browser.page.wait_for_load_state("domcontentloaded", timeout=1500)
+                browser.page.wait_for_url(
+                    lambda u: target_path in u.lower(), wait_until="commit", timeout=_PROBE_NAV_TIMEOUT_MS
+                )
             except Exception:
                 pass
             after = browser.page.url
             log_event(logger, "explore_click", point=[px, py], before=before, after=after)
             if after != before and target_path in after.lower():
+                # "commit" only means the URL changed; let the repo page reach
+                # DOMContentLoaded so the next observe doesn't capture the
+                # search results under the REPO stage.
+                try:
+                    browser.page.wait_for_load_state("domcontentloaded", timeout=_PROBE_LOAD_TIMEOUT_MS)
+                except Exception:
+                    pass
                 return True
     return False
 
 
+def _plan_explore_rounds(
+    bbox: Tuple[int, int, int, int], viewport_w: int, viewport_h: int
+) -> List[Tuple[str, Tuple[int, int, int, int], List[List[int]]]]:
+    # Clamp once, then derive each round's region from the previous one:
+    # A = whole card (3x2 grid), B and C = successive 70% top-left shrinks (5x2).
+    region = _clamp_bbox_to_viewport(bbox, viewport_w, viewport_h)
+    x1, y1, x2, y2 = region
+    if x2 <= x1 + 20 or y2 <= y1 + 20:
+        return []
+    rounds = []
+    for label, xs in (("A", 3), ("B", 5), ("C", 5)):
+        if label != "A":
+            region = _shrink_top_left(region, 0.70)
+        rounds.append((label, region, _grid_points(*region, xs=xs, ys=2)))
+    return rounds
+
+
+def _grid_fracs(xs: int, ys: int) -> Tuple[Tuple[float, ...], Tuple[float, ...]]:
+    return (
+        tuple((i + 1) / (xs + 1) for i in range(xs)),
+        tuple((i + 1) / (ys + 1) for i in range(ys)),
+    )
+
+
+# The explore rounds only ever ask for these two grids.
+_GRID_FRACS = {(xs, ys): _grid_fracs(xs, ys) for xs, ys in ((3, 2), (5, 2))}
+
+
 def _grid_points(x1: int, y1: int, x2: int, y2: int, xs: int, ys: int) -> List[List[int]]:
     w = max(1, x2 - x1)
     h = max(1, y2 - y1)
-    xs_fracs = [(i + 1) / (xs + 1) for i in range(xs)]
-    ys_fracs = [(i + 1) / (ys + 1) for i in range(ys)]
+    xs_fracs, ys_fracs = _GRID_FRACS.get((xs, ys)) or _grid_fracs(xs, ys)
     points: List[List[int]] = []
     for fy in ys_fracs:
         for fx in xs_fracs:
@@ -389,13 +617,8 @@ def _shrink_top_left(bbox: Tuple[int, int, int, int], scale: float) -> Tuple[int
     return (x1, y1, x1 + int(scale * w), y1 + int(scale * h))
 
 
-def _clamp_bbox_to_viewport(
-    browser: BrowserSession, bbox: Tuple[int, int, int, int]
-) -> Tuple[int, int, int, int]:
+def _clamp_bbox_to_viewport(bbox: Tuple[int, int, int, int], w: int, h: int) -> Tuple[int, int, int, int]:
     x1, y1, x2, y2 = bbox
-    viewport = browser.page.viewport_size or {"width": 1280, "height": 720}
-    w = viewport["width"]
-    h = viewport["height"]
     x1 = max(220, min(x1, w))
     x2 = max(220, min(x2, w))
     y1 = max(0, min(y1, h))
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from dataclasses import dataclass
 from enum import Enum
 from typing import Any, Dict, List, Optional
 
@@ -15,7 +16,8 @@ class Stage(str, Enum):
     DONE = "DONE"
 
 
-class ReleaseInfo(BaseModel):
+@dataclass(slots=True)
+class ReleaseInfo:
     version: Optional[str] = None
     tag: Optional[str] = None
     author: Optional[str] = None
@@ -31,8 +33,7 @@ class AgentState(BaseModel):
 
     current_url: Optional[str] = None
     page_title: Optional[str] = None
-    last_png_bytes: Optional[bytes] = None
-    last_png_bytes_raw: Optional[bytes] = None
+    last_png_ref: Optional[int] = None
     last_screenshot_path: Optional[str] = None
 
     step_count: int = 0
@@ -42,23 +43,34 @@ class AgentState(BaseModel):
 
     last_urls: List[str] = Field(default_factory=list)
     last_screenshot_hashes: List[str] = Field(default_factory=list)
+    url_counts: Dict[str, int] = Field(default_factory=dict)
+    hash_counts: Dict[str, int] = Field(default_factory=dict)
 
     stage: Stage = Stage.HOME
     last_action: Optional[Dict[str, Any]] = None
     last_bbox: Optional[tuple[int, int, int, int]] = None
     refine_level: int = 0
     pending_candidates: List[Dict[str, Any]] = Field(default_factory=list)
+    planned_actions: List[Dict[str, Any]] = Field(default_factory=list)
+    home_shortcut_tried: bool = False
     extracted_release: Optional[ReleaseInfo] = None
 
     run_dir: Optional[str] = None
     next_node: Optional[str] = None
 
     def push_url(self, url: str, max_keep: int = 6) -> None:
-        self.last_urls.append(url)
-        if len(self.last_urls) > max_keep:
-            self.last_urls = self.last_urls[-max_keep:]
+        _push_counted(self.last_urls, self.url_counts, url, max_keep)
 
     def push_hash(self, h: str, max_keep: int = 6) -> None:
-        self.last_screenshot_hashes.append(h)
-        if len(self.last_screenshot_hashes) > max_keep:
-            self.last_screenshot_hashes = self.last_screenshot_hashes[-max_keep:]
+        _push_counted(self.last_screenshot_hashes, self.hash_counts, h, max_keep)
+
+
+def _push_counted(window: List[str], counts: Dict[str, int], value: str, max_keep: int) -> None:
+    # Keep counts in step with the sliding window so repeat checks are O(1).
+    window.append(value)
+    counts[value] = counts.get(value, 0) + 1
+    while len(window) > max_keep:
+        old = window.pop(0)
+        counts[old] -= 1
+        if not counts[old]:
+            del counts[old]
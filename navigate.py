@@ -5,7 +5,7 @@ import json
 import sys
 from typing import Any, Dict
 
-from agent.graph import build_graph
+from agent.graph import build_graph, flush_io
 from agent.state import AgentState
 from tools.browser import BrowserSession
 from tools.extractor import ReleaseExtractor
@@ -60,6 +60,8 @@ def main() -> int:
         graph = build_graph(browser, vision, validator, extractor, tracer, logger)
         final_state: Dict[str, Any] = graph.invoke(state.model_dump())
     finally:
+        flush_io()
+        tracer.close()
         browser.close()
 
     result = _format_output(final_state)
@@ -8,11 +8,11 @@ import os
 from playwright.sync_api import Browser, Page, sync_playwright
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Observation:
     url: str
     title: str
-    screenshot_png: bytes
+    screenshot_vlm: bytes
     viewport: Dict[str, int]
 
 
@@ -23,6 +23,8 @@ class BrowserSession:
         slow_mo_ms: int = 0,
         action_delay_ms: int = 250,
         user_data_dir: Optional[str] = None,
+        screenshot_quality: int = 75,
+        settle_ms: int = 500,
     ) -> None:
         self._playwright = None
         self._browser: Optional[Browser] = None
@@ -31,6 +33,8 @@ class BrowserSession:
         self._slow_mo_ms = slow_mo_ms
         self._action_delay_s = action_delay_ms / 1000.0
         self._user_data_dir = user_data_dir
+        self._screenshot_quality = screenshot_quality
+        self._settle_s = settle_ms / 1000.0
 
     def start(self, url: str) -> None:
         self._playwright = sync_playwright().start()
@@ -64,7 +68,16 @@ class BrowserSession:
     def observe(self) -> Observation:
         page = self.page
         viewport = page.viewport_size or {"width": 1280, "height": 720}
-        time.sleep(1.0)
+        started = time.monotonic()
+        try:
+            page.wait_for_load_state("networkidle", timeout=1500)
+        except Exception:
+            pass
+        # networkidle resolves at once if it already fired for this document,
+        # which is the case after same-document (pushState/Turbo) navigations;
+        # give those a short bounded settle before the screenshot.
+        if time.monotonic() - started < 0.05:
+            time.sleep(self._settle_s)
         try:
             title = page.title()
         except Exception:
@@ -73,8 +86,10 @@ class BrowserSession:
                 title = page.title()
             except Exception:
                 title = ""
-        png = page.screenshot(full_page=False)
-        return Observation(url=page.url, title=title, screenshot_png=png, viewport=viewport)
+        # JPEG is several times cheaper to encode than PNG and much smaller to
+        # upload; the VLM downsamples the frame anyway.
+        shot = page.screenshot(full_page=False, type="jpeg", quality=self._screenshot_quality)
+        return Observation(url=page.url, title=title, screenshot_vlm=shot, viewport=viewport)
 
     def wait_for_idle(self, timeout_ms: int = 8000) -> None:
         page = self.page
@@ -99,7 +114,6 @@ class BrowserSession:
     def type_text(self, text: str) -> None:
         self.page.keyboard.type(text, delay=20)
         self._delay()
-        time.sleep(0.2)
 
     def scroll(self, direction: str, amount: int = 400) -> None:
         sign = 1 if direction == "down" else -1
@@ -123,7 +137,6 @@ class BrowserSession:
 
     def type_into_bbox(self, bbox: Tuple[int, int, int, int], text: str) -> None:
         self.click_bbox(bbox)
-        time.sleep(0.1)
         self.type_text(text)
 
     def _ensure_in_viewport(self, x: int, y: int) -> None:
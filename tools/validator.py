@@ -1,16 +1,13 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Optional, Tuple
-
-from PIL import Image
-from io import BytesIO
+from typing import Dict, Optional, Tuple
 
 from agent.state import AgentState, Stage
-from utils.image_hash import average_hash
+from utils.bbox_guards import ScreenshotFeatures
 
 
-@dataclass
+@dataclass(slots=True)
 class ValidationResult:
     new_stage: Optional[Stage] = None
     recovery_action: Optional[dict] = None
@@ -20,18 +17,21 @@ class ValidationResult:
 
 
 class Validator:
-    def __init__(self, repeat_threshold: int = 3) -> None:
+    def __init__(self, repeat_threshold: int = 3, hash_cache_size: int = 16) -> None:
         self._repeat_threshold = repeat_threshold
+        self._hash_cache: Dict[Tuple[int, int], str] = {}
+        self._hash_cache_size = hash_cache_size
 
-    def assess(self, state: AgentState, png_bytes: bytes) -> Tuple[ValidationResult, str]:
-        img = Image.open(BytesIO(png_bytes))
-        h = average_hash(img)
+    def assess(
+        self, state: AgentState, png_bytes: bytes, features: Optional[ScreenshotFeatures] = None
+    ) -> Tuple[ValidationResult, str]:
+        h = self._screenshot_hash(png_bytes, features)
         state.push_hash(h)
         if state.current_url:
             state.push_url(state.current_url)
 
-        repeated_hashes = state.last_screenshot_hashes.count(h)
-        repeated_urls = state.current_url and state.last_urls.count(state.current_url) or 0
+        repeated_hashes = state.hash_counts.get(h, 0)
+        repeated_urls = state.current_url and state.url_counts.get(state.current_url, 0) or 0
         stuck = repeated_hashes >= self._repeat_threshold and repeated_urls >= self._repeat_threshold
 
         result = ValidationResult()
@@ -74,3 +74,15 @@ class Validator:
                 result.should_extract = True
 
         return result, h
+
+    def _screenshot_hash(self, png_bytes: bytes, features: Optional[ScreenshotFeatures]) -> str:
+        # Identical screenshots (an idle page, i.e. the "stuck" case) skip the
+        # PNG decode; bytes objects cache their own hash after the first call.
+        key = (len(png_bytes), hash(png_bytes))
+        h = self._hash_cache.get(key)
+        if h is None:
+            h = (features or ScreenshotFeatures(png_bytes)).hash()
+            if len(self._hash_cache) >= self._hash_cache_size:
+                self._hash_cache.pop(next(iter(self._hash_cache)))
+            self._hash_cache[key] = h
+        return h
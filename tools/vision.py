@@ -1,12 +1,26 @@
 from __future__ import annotations
 
-import base64
+import asyncio
 import json
-from typing import Any, Dict, Optional, Tuple
+import re
+from io import BytesIO
+from typing import Any, Dict, List, Optional, Tuple
 
-from openai import OpenAI
+import httpx
+from openai import AsyncOpenAI, DefaultHttpxClient, OpenAI
+from PIL import Image
 from pydantic import BaseModel, ValidationError
 
+try:
+    from pybase64 import b64encode
+except ImportError:  # pybase64 is optional; the stdlib encoder is just slower.
+    from base64 import b64encode
+
+try:
+    from orjson import loads as _json_loads
+except ImportError:  # orjson is optional; fall back to the stdlib decoder.
+    _json_loads = json.loads
+
 
 class ScrollSpec(BaseModel):
     direction: str
@@ -31,9 +45,11 @@ class Action(BaseModel):
     bbox: Optional[list[int]] = None
     text: Optional[str] = None
     key: Optional[str] = None
+    focus_key: Optional[str] = None
     scroll: Optional[ScrollSpec] = None
     expect: Optional[ExpectSpec] = None
     candidates: Optional[list[CandidateBBox]] = None
+    plan: Optional[list[Action]] = None
 
 
 class ReleaseExtract(BaseModel):
@@ -42,17 +58,157 @@ class ReleaseExtract(BaseModel):
     author: Optional[str] = None
 
 
+# The closing fence is optional: truncated replies often omit it.
+_FENCE_RE = re.compile(r"^\s*```(?:json)?\s*(.*?)\s*(?:```)?\s*$", re.S | re.I)
+
+_ALLOWED_KEYS = frozenset(
+    {
+        "Enter",
+        "Tab",
+        "Escape",
+        "ArrowDown",
+        "ArrowUp",
+        "ArrowLeft",
+        "ArrowRight",
+        "PageDown",
+        "PageUp",
+        "Home",
+        "End",
+        "Backspace",
+        "Delete",
+    }
+)
+
+# Action types some models emit for what is just a click on the bbox.
+_CLICK_ALIASES = frozenset({"bbox", "box", "click_type", "click-and-type", "click_and_type"})
+
+_NESTED_ACTION_FIELDS = ("scroll", "expect", "candidates", "plan")
+
+
+def _is_flat_action(payload: Dict[str, Any]) -> bool:
+    # Most responses are a plain click/type/press with scalar fields and a flat
+    # bbox; those can skip pydantic validation. Anything with nested specs
+    # still goes through model_validate so sub-models get built.
+    if not isinstance(payload.get("type"), str) or not isinstance(payload.get("reason"), str):
+        return False
+    bbox = payload.get("bbox")
+    if bbox is not None and not (isinstance(bbox, list) and len(bbox) == 4 and all(type(v) is int for v in bbox)):
+        return False
+    if not all(isinstance(payload.get(k), (str, type(None))) for k in ("text", "key", "focus_key")):
+        return False
+    return all(payload.get(k) is None for k in _NESTED_ACTION_FIELDS)
+
+
+def _is_well_formed(payload: Dict[str, Any]) -> bool:
+    # True when _normalize_action_payload would leave the payload untouched,
+    # which is the usual flat click/type/press response.
+    action_type = payload.get("type")
+    if isinstance(action_type, str) and action_type.lower() in _CLICK_ALIASES:
+        return False
+    if "coords" in payload or payload.get("candidates") is not None:
+        return False
+    bbox = payload.get("bbox")
+    if isinstance(bbox, list) and bbox and isinstance(bbox[0], list):
+        return False
+    if isinstance(payload.get("expect"), str):
+        return False
+    scroll = payload.get("scroll")
+    if scroll is False or (isinstance(scroll, dict) and isinstance(scroll.get("amount"), float)):
+        return False
+    key = payload.get("key")
+    return not isinstance(key, str) or key in _ALLOWED_KEYS
+
+
+def _unscale_bboxes(payload: Dict[str, Any], scale: float) -> None:
+    def unscale(bbox: Any) -> Any:
+        if isinstance(bbox, list) and all(isinstance(v, (int, float)) for v in bbox):
+            return [int(round(v / scale)) for v in bbox]
+        return bbox
+
+    if "bbox" in payload:
+        payload["bbox"] = unscale(payload["bbox"])
+    for c in payload.get("candidates") or []:
+        if isinstance(c, dict) and "bbox" in c:
+            c["bbox"] = unscale(c["bbox"])
+
+
+_shared_openai: Optional[OpenAI] = None
+
+
+def _openai_client() -> OpenAI:
+    # One client (and connection pool) per process, so every VisionClient
+    # reuses warm keep-alive connections instead of repeating TLS handshakes.
+    global _shared_openai
+    if _shared_openai is None:
+        try:
+            import h2  # noqa: F401  # httpx needs it for HTTP/2
+            http2 = True
+        except ImportError:
+            http2 = False
+        http_client = DefaultHttpxClient(http2=http2, limits=httpx.Limits(max_keepalive_connections=32))
+        _shared_openai = OpenAI(http_client=http_client)
+    return _shared_openai
+
+
 class VisionClient:
-    def __init__(self, model_nav: str = "gpt-5-mini", model_extract: Optional[str] = None) -> None:
-        self._client = OpenAI()
+    def __init__(
+        self, model_nav: str = "gpt-5-mini", model_extract: Optional[str] = None, max_image_dim: int = 1280
+    ) -> None:
+        self._client = _openai_client()
         self._model_nav = model_nav
         self._model_extract = model_extract or model_nav
+        self._max_image_dim = max_image_dim
+        # id(original) -> (original, upload bytes, scale); holding the original
+        # keeps a recycled id from matching a different screenshot.
+        self._prepared: Dict[int, Tuple[bytes, bytes, float]] = {}
 
     @staticmethod
-    def _b64(png_bytes: bytes) -> str:
-        return base64.b64encode(png_bytes).decode("ascii")
+    def _data_url(image_bytes: bytes) -> str:
+        mime = b"image/jpeg" if image_bytes[:2] == b"\xff\xd8" else b"image/png"
+        return (b"data:" + mime + b";base64," + b64encode(image_bytes)).decode("ascii")
+
+    def get_action(self, png_bytes: bytes, subgoal: str, stage: str, allow_plan: bool = False) -> Action:
+        system, user = self._action_prompts(subgoal, stage, allow_plan)
+        return self._call_action(self._model_nav, system, user, png_bytes)
+
+    def get_release_extract(self, png_bytes: bytes, repo: str) -> ReleaseExtract:
+        system, user = self._extract_prompts(repo)
+        return self._call_extract(self._model_extract, system, user, png_bytes)
+
+    def get_actions_batch(self, png_bytes_list: List[bytes], subgoals: List[str], stage: str) -> List[Action]:
+        if len(png_bytes_list) != len(subgoals):
+            raise ValueError(f"got {len(png_bytes_list)} screenshots but {len(subgoals)} subgoals")
+        prepared = [self._prepare_image(b) for b in png_bytes_list]
+
+        async def run() -> List[Dict[str, Any]]:
+            async with AsyncOpenAI() as client:
+                calls = []
+                for (data, _), subgoal in zip(prepared, subgoals):
+                    system, user = self._action_prompts(subgoal, stage, False)
+                    calls.append(self._call_json_async(client, self._model_nav, system, user, data))
+                return await asyncio.gather(*calls)
+
+        return [self._to_action(payload, scale) for payload, (_, scale) in zip(asyncio.run(run()), prepared)]
+
+    def get_action_and_extract(
+        self, png_bytes: bytes, subgoal: str, stage: str, repo: str
+    ) -> Tuple[Action, ReleaseExtract]:
+        data, scale = self._prepare_image(png_bytes)
+
+        async def run() -> List[Dict[str, Any]]:
+            async with AsyncOpenAI() as client:
+                nav_system, nav_user = self._action_prompts(subgoal, stage, False)
+                ext_system, ext_user = self._extract_prompts(repo)
+                return await asyncio.gather(
+                    self._call_json_async(client, self._model_nav, nav_system, nav_user, data),
+                    self._call_json_async(client, self._model_extract, ext_system, ext_user, data),
+                )
+
+        nav_payload, ext_payload = asyncio.run(run())
+        return self._to_action(nav_payload, scale), self._to_release_extract(ext_payload)
 
-    def get_action(self, png_bytes: bytes, subgoal: str, stage: str) -> Action:
+    @staticmethod
+    def _action_prompts(subgoal: str, stage: str, allow_plan: bool) -> Tuple[str, str]:
         system = (
             "You are a VLM navigation agent. Use ONLY the screenshot to decide the next UI action. "
             "Return STRICT JSON that matches the Action schema. No prose. "
@@ -64,26 +220,95 @@ class VisionClient:
             "Return JSON: {type, reason, bbox?, text?, key?, scroll?, expect?}. "
             "bbox uses pixel coordinates [x1,y1,x2,y2] in the screenshot." 
         )
-        return self._call_action(self._model_nav, system, user, png_bytes)
+        if allow_plan:
+            user += (
+                " Optionally include plan: a list of up to 3 follow-up actions with the same shape, "
+                "only for keyboard steps (type or press, no bbox) that are certain without a new screenshot "
+                "(e.g. type the query, then press Enter). "
+                "Set expect.url_contains on any action that should navigate."
+            )
+        return system, user
 
-    def get_release_extract(self, png_bytes: bytes, repo: str) -> ReleaseExtract:
+    @staticmethod
+    def _extract_prompts(repo: str) -> Tuple[str, str]:
         system = (
             "You are a VLM extraction agent. Use ONLY the screenshot to read the latest release info. "
             "Return STRICT JSON with keys: version, tag, author. No prose."
         )
         user = f"Repository: {repo}. Extract latest release info from the page."
-        return self._call_extract(self._model_extract, system, user, png_bytes)
+        return system, user
 
     def _call_action(self, model: str, system: str, user: str, png_bytes: bytes) -> Action:
-        payload = self._call_json(model, system, user, png_bytes)
-        payload = self._normalize_action_payload(payload)
+        data, scale = self._prepare_image(png_bytes)
+        return self._to_action(self._call_json(model, system, user, data), scale)
+
+    def _call_extract(self, model: str, system: str, user: str, png_bytes: bytes) -> ReleaseExtract:
+        data, _ = self._prepare_image(png_bytes)
+        return self._to_release_extract(self._call_json(model, system, user, data))
+
+    def _prepare_image(self, png_bytes: bytes) -> Tuple[bytes, float]:
+        # Downscale oversized screenshots before upload; the returned scale maps
+        # model coordinates back to the original screenshot.
+        cached = self._prepared.get(id(png_bytes))
+        if cached is not None and cached[0] is png_bytes:
+            return cached[1], cached[2]
+        img = Image.open(BytesIO(png_bytes))
+        data, scale = png_bytes, 1.0
+        if max(img.size) > self._max_image_dim:
+            scale = self._max_image_dim / max(img.size)
+            is_jpeg = img.format == "JPEG"
+            img.thumbnail((self._max_image_dim, self._max_image_dim), Image.Resampling.LANCZOS)
+            buf = BytesIO()
+            if is_jpeg:
+                img.save(buf, "JPEG", quality=85)
+            else:
+                img.save(buf, "PNG", optimize=False, compress_level=1)
+            data = buf.getvalue()
+        if len(self._prepared) >= 2:
+            self._prepared.pop(next(iter(self._prepared)))
+        self._prepared[id(png_bytes)] = (png_bytes, data, scale)
+        return data, scale
+
+    @classmethod
+    def _to_action(cls, payload: Dict[str, Any], scale: float = 1.0) -> Action:
+        payload = cls._normalize_action_payload(payload)
+        plan = payload.pop("plan", None)
+        if scale != 1.0:
+            _unscale_bboxes(payload, scale)
         try:
-            return Action.model_validate(payload)
+            action = cls._build_action(payload)
         except ValidationError as e:
             raise RuntimeError(f"Invalid Action JSON: {e}")
+        # Plan steps are optional extras: a malformed one is dropped rather
+        # than failing the main action.
+        steps = []
+        for p in plan if isinstance(plan, list) else []:
+            if not isinstance(p, dict):
+                continue
+            p = cls._normalize_action_payload(p)
+            p.pop("plan", None)
+            if scale != 1.0:
+                _unscale_bboxes(p, scale)
+            try:
+                steps.append(cls._build_action(p))
+            except ValidationError:
+                continue
+        if steps:
+            action.plan = steps
+        return action
 
-    def _call_extract(self, model: str, system: str, user: str, png_bytes: bytes) -> ReleaseExtract:
-        payload = self._call_json(model, system, user, png_bytes)
+    @staticmethod
+    def _build_action(payload: Dict[str, Any]) -> Action:
+        if _is_flat_action(payload):
+            return Action.model_construct(**payload)
+        return Action.model_validate(payload)
+
+    @staticmethod
+    def _to_release_extract(payload: Dict[str, Any]) -> ReleaseExtract:
+        if isinstance(payload, dict) and all(
+            isinstance(payload.get(k), (str, type(None))) for k in ReleaseExtract.model_fields
+        ):
+            return ReleaseExtract.model_construct(**{k: payload.get(k) for k in ReleaseExtract.model_fields})
         try:
             return ReleaseExtract.model_validate(payload)
         except ValidationError as e:
@@ -91,10 +316,10 @@ class VisionClient:
 
     @staticmethod
     def _normalize_action_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
+        if _is_well_formed(payload):
+            return payload
         action_type = payload.get("type")
-        if isinstance(action_type, str) and action_type.lower() in ("bbox", "box"):
-            payload["type"] = "click"
-        if isinstance(action_type, str) and action_type.lower() in ("click_type", "click-and-type", "click_and_type"):
+        if isinstance(action_type, str) and action_type.lower() in _CLICK_ALIASES:
             payload["type"] = "click"
         # Map top-level coords -> bbox if present.
         if "coords" in payload and "bbox" not in payload:
@@ -106,15 +331,15 @@ class VisionClient:
             payload["bbox"] = None
         # Normalize candidates
         cands = payload.get("candidates")
-        if isinstance(cands, list):
+        if isinstance(cands, list) and not all(isinstance(c, dict) and isinstance(c.get("bbox"), list) for c in cands):
             norm = []
             for c in cands:
                 if isinstance(c, dict):
                     if "coords" in c and "bbox" not in c:
                         c["bbox"] = c.get("coords")
                     if isinstance(c.get("bbox"), dict):
-                        c = {**c, **c["bbox"]}
-                    if "bbox" in c and isinstance(c["bbox"], list):
+                        c.update(c.pop("bbox"))
+                    if isinstance(c.get("bbox"), list):
                         norm.append(c)
                 elif isinstance(c, list) and len(c) == 4:
                     norm.append({"bbox": c})
@@ -134,74 +359,81 @@ class VisionClient:
                 else:
                     scroll["amount"] = int(round(amount))
         key = payload.get("key")
-        if isinstance(key, str):
-            allowed = {
-                "Enter",
-                "Tab",
-                "Escape",
-                "ArrowDown",
-                "ArrowUp",
-                "ArrowLeft",
-                "ArrowRight",
-                "PageDown",
-                "PageUp",
-                "Home",
-                "End",
-                "Backspace",
-                "Delete",
-            }
-            if key not in allowed:
-                payload["key"] = None
+        if isinstance(key, str) and key not in _ALLOWED_KEYS:
+            payload["key"] = None
         return payload
 
     def _call_json(self, model: str, system: str, user: str, png_bytes: bytes) -> Dict[str, Any]:
-        img_b64 = self._b64(png_bytes)
-        img_data_url = f"data:image/png;base64,{img_b64}"
+        img_data_url = self._data_url(png_bytes)
         last_err: Optional[Exception] = None
         for attempt in range(3):
             try:
                 resp = self._client.responses.create(
-                    model=model,
-                    input=[
-                        {
-                            "role": "system",
-                            "content": [
-                                {"type": "input_text", "text": system},
-                            ],
-                        },
-                        {
-                            "role": "user",
-                            "content": [
-                                {"type": "input_text", "text": user},
-                                {"type": "input_image", "image_url": img_data_url},
-                            ],
-                        },
-                    ],
+                    model=model, input=self._request_input(system, user, img_data_url)
                 )
-                text = resp.output_text or ""
-                if not text.strip():
-                    # Try to recover from empty output_text by inspecting output items.
-                    try:
-                        parts = []
-                        for item in resp.output or []:
-                            for c in getattr(item, "content", []) or []:
-                                if getattr(c, "type", "") in ("output_text", "summary_text"):
-                                    parts.append(getattr(c, "text", ""))
-                        text = "\n".join(p for p in parts if p).strip()
-                    except Exception:
-                        text = ""
-                if not text.strip():
-                    raise RuntimeError(f"Empty model output_text (model={model})")
-                cleaned = text.strip()
-                if cleaned.startswith("```"):
-                    cleaned = cleaned.strip("`")
-                    cleaned = cleaned.replace("json", "", 1).strip()
-                try:
-                    payload = json.loads(cleaned)
-                except json.JSONDecodeError as je:
-                    raise RuntimeError(f"Non-JSON model output: {text[:400]}") from je
-                return payload
+                return self._parse_payload(resp, model)
             except Exception as e:  # pragma: no cover - best effort
                 last_err = e
                 system += " Return valid JSON only."
         raise RuntimeError(f"Vision call failed: {last_err}")
+
+    async def _call_json_async(
+        self, client: AsyncOpenAI, model: str, system: str, user: str, png_bytes: bytes
+    ) -> Dict[str, Any]:
+        img_data_url = self._data_url(png_bytes)
+        last_err: Optional[Exception] = None
+        for attempt in range(3):
+            try:
+                resp = await client.responses.create(
+                    model=model, input=self._request_input(system, user, img_data_url)
+                )
+                return self._parse_payload(resp, model)
+            except Exception as e:  # pragma: no cover - best effort
+                last_err = e
+                system += " Return valid JSON only."
+        raise RuntimeError(f"Vision call failed: {last_err}")
+
+    @staticmethod
+    def _request_input(system: str, user: str, img_data_url: str) -> List[Dict[str, Any]]:
+        return [
+            {
+                "role": "system",
+                "content": [
+                    {"type": "input_text", "text": system},
+                ],
+            },
+            {
+                "role": "user",
+                "content": [
+                    {"type": "input_text", "text": user},
+                    {"type": "input_image", "image_url": img_data_url},
+                ],
+            },
+        ]
+
+    @staticmethod
+    def _parse_payload(resp: Any, model: str) -> Dict[str, Any]:
+        text = resp.output_text or ""
+        if not text.strip():
+            # Try to recover from empty output_text by inspecting output items.
+            try:
+                parts = []
+                for item in resp.output or []:
+                    for c in getattr(item, "content", []) or []:
+                        if getattr(c, "type", "") in ("output_text", "summary_text"):
+                            parts.append(getattr(c, "text", ""))
+                text = "\n".join(p for p in parts if p).strip()
+            except Exception:
+                text = ""
+        if not text.strip():
+            raise RuntimeError(f"Empty model output_text (model={model})")
+        cleaned = text.strip()
+        if cleaned[:1] not in ("{", "["):
+            fenced = _FENCE_RE.match(cleaned)
+            if fenced:
+                cleaned = fenced.group(1)
+        try:
+            payload = _json_loads(cleaned)
+        except ValueError as je:  # json and orjson decode errors both subclass it
+            raise RuntimeError(f"Non-JSON model output: {text[:400]}") from je
+        return payload
@@ -1,40 +1,134 @@
 from __future__ import annotations
 
+import math
 from io import BytesIO
-from typing import Tuple
+from typing import Any, Callable, Dict, List, Sequence, Tuple, Union
 
+import numpy as np
 from PIL import Image
 
+from utils.image_hash import average_hash
+
+try:
+    from numba import njit, prange
+except ImportError:  # numba is optional; fall back to the NumPy kernel below.
+    njit = None
+
+try:
+    from turbojpeg import TJPF_RGB, TurboJPEG
+
+    _tj = TurboJPEG()
+except Exception:  # PyTurboJPEG or libturbojpeg missing; decode with PIL.
+    _tj = None
+
+ImageLike = Union[bytes, np.ndarray]
+
+# Recently decoded screenshots keyed by id(); the bytes object is kept in the
+# entry so an id reused after garbage collection can't alias a stale frame.
+_DECODE_CACHE_SIZE = 4
+_decode_cache: Dict[int, Tuple[bytes, np.ndarray]] = {}
+
+
+def decode_rgb(png_bytes: bytes) -> np.ndarray:
+    if _tj is not None and png_bytes[:2] == b"\xff\xd8":
+        return _tj.decode(png_bytes, pixel_format=TJPF_RGB)
+    img = Image.open(BytesIO(png_bytes))
+    # convert() copies even when the mode already matches; screenshots are
+    # usually RGB already, so only RGBA/palette images pay for it.
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    return np.asarray(img)
+
+
+class ScreenshotFeatures:
+    # One decoded screenshot shared by the perceptual hash and the blue-link
+    # checks, so a step pays for a single decode however many are asked for.
+    __slots__ = ("arr", "_ii", "_hash")
+
+    def __init__(self, image: ImageLike) -> None:
+        self.arr = _as_frame(image)
+        self._ii: np.ndarray | None = None
+        self._hash: str | None = None
+
+    def hash(self) -> str:
+        if self._hash is None:
+            self._hash = average_hash(Image.fromarray(self.arr))
+        return self._hash
+
+    def blue_ratio(self, bbox: Tuple[int, int, int, int]) -> float:
+        return float(self.blue_ratios([bbox])[0])
+
+    def blue_ratios(self, bboxes: Sequence[Tuple[int, int, int, int]]) -> np.ndarray:
+        h, w = self.arr.shape[:2]
+        ratios = np.zeros(len(bboxes))
+        boxes = []
+        for i, bbox in enumerate(bboxes):
+            x1, y1, x2, y2 = _clamp_bbox(bbox, w, h)
+            if x2 - x1 >= 5 and y2 - y1 >= 5:
+                boxes.append((i, x1, y1, x2, y2))
+        if not boxes:
+            return ratios
+        # Scanning each crop is cheaper until the crops add up to a full frame;
+        # past that, one integral image answers every later bbox in O(1).
+        if self._ii is None and sum((x2 - x1) * (y2 - y1) for _, x1, y1, x2, y2 in boxes) < h * w:
+            for i, x1, y1, x2, y2 in boxes:
+                ratios[i] = _count_blue(self.arr, x1, y1, x2, y2) / ((x2 - x1) * (y2 - y1))
+            return ratios
+        ii = self._integral()
+        for i, x1, y1, x2, y2 in boxes:
+            ratios[i] = (ii[y2, x2] - ii[y1, x2] - ii[y2, x1] + ii[y1, x1]) / ((x2 - x1) * (y2 - y1))
+        return ratios
+
+    def _integral(self) -> np.ndarray:
+        if self._ii is None:
+            h, w = self.arr.shape[:2]
+            ii = np.zeros((h + 1, w + 1), dtype=np.int64)
+            ii[1:, 1:] = _blue_mask(self.arr).cumsum(0).cumsum(1)
+            self._ii = ii
+        return self._ii
+
 
 def bbox_in_valid_column(bbox: Tuple[int, int, int, int], img_w: int, img_h: int) -> bool:
-    x1, y1, x2, y2 = bbox
-    if x2 <= x1 or y2 <= y1:
-        return False
-    if (x2 - x1) < 5 or (y2 - y1) < 5:
-        return False
-    cx = (x1 + x2) / 2.0
-    cy = (y1 + y2) / 2.0
+    return make_column_guard(img_w, img_h)(bbox)
+
 
+def make_column_guard(img_w: int, img_h: int) -> Callable[[Tuple[int, int, int, int]], bool]:
     header_frac = 0.10
     left_frac = 0.16
     right_frac = 0.82
 
-    if cy < img_h * header_frac:
-        return False
-    if cx < img_w * left_frac:
-        return False
-    if cx > img_w * right_frac:
-        return False
-    return True
+    # Compare doubled centres (x1 + x2, y1 + y2) against doubled thresholds so
+    # each check is a plain int compare; rounding keeps it exact.
+    min_cy2 = math.ceil(2 * (img_h * header_frac))
+    min_cx2 = math.ceil(2 * (img_w * left_frac))
+    max_cx2 = math.floor(2 * (img_w * right_frac))
+
+    def guard(bbox: Tuple[int, int, int, int]) -> bool:
+        x1, y1, x2, y2 = bbox
+        if (x2 - x1) < 5 or (y2 - y1) < 5:
+            return False
+        return y1 + y2 >= min_cy2 and min_cx2 <= x1 + x2 <= max_cx2
+
+    return guard
 
 
-def looks_like_blue_link(png_bytes: bytes, bbox: Tuple[int, int, int, int]) -> bool:
-    ratio = _blue_ratio(png_bytes, bbox)
+def looks_like_blue_link(image: ImageLike, bbox: Tuple[int, int, int, int]) -> bool:
+    ratio = _blue_ratio(image, bbox)
     return ratio >= _blue_ratio_threshold(bbox)
 
 
-def blue_ratio(png_bytes: bytes, bbox: Tuple[int, int, int, int]) -> float:
-    return _blue_ratio(png_bytes, bbox)
+def blue_ratio(image: ImageLike, bbox: Tuple[int, int, int, int]) -> float:
+    return _blue_ratio(image, bbox)
+
+
+def blue_ratios_batch(image: ImageLike, bboxes: Sequence[Tuple[int, int, int, int]]) -> np.ndarray:
+    return ScreenshotFeatures(image).blue_ratios(bboxes)
+
+
+def filter_blue_candidates(image: ImageLike, candidates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    bboxes = [tuple(c["bbox"]) for c in candidates]
+    ratios = blue_ratios_batch(image, bboxes)
+    return [c for c, bbox, ratio in zip(candidates, bboxes, ratios) if ratio >= _blue_ratio_threshold(bbox)]
 
 
 def _blue_ratio_threshold(bbox: Tuple[int, int, int, int]) -> float:
@@ -45,21 +139,61 @@ def _blue_ratio_threshold(bbox: Tuple[int, int, int, int]) -> float:
     return 0.008
 
 
-def _blue_ratio(png_bytes: bytes, bbox: Tuple[int, int, int, int]) -> float:
-    img = Image.open(BytesIO(png_bytes)).convert("RGB")
-    w, h = img.size
-    x1, y1, x2, y2 = _clamp_bbox(bbox, w, h)
-    if x2 - x1 < 5 or y2 - y1 < 5:
-        return 0.0
-    region = img.crop((x1, y1, x2, y2))
-    pixels = list(region.getdata())
-    if not pixels:
-        return 0.0
-    blueish = 0
-    for r, g, b in pixels:
-        if (b > g + 30) and (b > r + 40) and (b > 90):
-            blueish += 1
-    return blueish / len(pixels)
+def _as_frame(image: ImageLike) -> np.ndarray:
+    if isinstance(image, np.ndarray):
+        return image
+    entry = _decode_cache.get(id(image))
+    if entry is not None and entry[0] is image:
+        return entry[1]
+    arr = decode_rgb(image)
+    if len(_decode_cache) >= _DECODE_CACHE_SIZE:
+        _decode_cache.pop(next(iter(_decode_cache)))
+    _decode_cache[id(image)] = (image, arr)
+    return arr
+
+
+def _blue_ratio(image: ImageLike, bbox: Tuple[int, int, int, int]) -> float:
+    return ScreenshotFeatures(image).blue_ratio(bbox)
+
+
+if njit is not None:
+
+    @njit(cache=True, parallel=True)
+    def _count_blue(arr, x1, y1, x2, y2):
+        count = 0
+        for y in prange(y1, y2):
+            for x in range(x1, x2):
+                r = int(arr[y, x, 0])
+                g = int(arr[y, x, 1])
+                b = int(arr[y, x, 2])
+                if b > g + 30 and b > r + 40 and b > 90:
+                    count += 1
+        return count
+
+    @njit(cache=True, parallel=True)
+    def _blue_mask(region):
+        # One fused pass; the NumPy version below materialises a temporary per
+        # comparison, which adds up on the full-frame integral-image path.
+        h, w = region.shape[0], region.shape[1]
+        out = np.empty((h, w), dtype=np.bool_)
+        for y in prange(h):
+            for x in range(w):
+                r = int(region[y, x, 0])
+                g = int(region[y, x, 1])
+                b = int(region[y, x, 2])
+                out[y, x] = b > g + 30 and b > r + 40 and b > 90
+        return out
+
+else:
+
+    def _count_blue(arr: np.ndarray, x1: int, y1: int, x2: int, y2: int) -> int:
+        return int(np.count_nonzero(_blue_mask(arr[y1:y2, x1:x2])))
+
+    def _blue_mask(region: np.ndarray) -> np.ndarray:
+        r, g, b = region[..., 0], region[..., 1], region[..., 2]
+        # Stay in uint8: b - 30 / b - 40 only wrap when b < 40, and those pixels
+        # already fail b > 90, so no int16 copy of the region is needed.
+        return (b > 90) & (b - 30 > g) & (b - 40 > r)
 
 
 def _clamp_bbox(bbox: Tuple[int, int, int, int], w: int, h: int) -> Tuple[int, int, int, int]:
@@ -1,15 +1,14 @@
 from __future__ import annotations
 
+import numpy as np
 from PIL import Image
 
 
 def average_hash(image: Image.Image, hash_size: int = 8) -> str:
-    img = image.convert("L").resize((hash_size, hash_size))
-    pixels = list(img.getdata())
-    avg = sum(pixels) / len(pixels)
-    bits = ["1" if p >= avg else "0" for p in pixels]
-    hex_string = ""
-    for i in range(0, len(bits), 4):
-        nibble = bits[i : i + 4]
-        hex_string += f"{int(''.join(nibble), 2):x}"
-    return hex_string
+    if image.mode != "L":
+        image = image.convert("L")
+    pixels = np.asarray(image.resize((hash_size, hash_size)), dtype=np.uint8)
+    bits = (pixels >= pixels.mean()).ravel()
+    # packbits zero-pads the tail to a whole byte; trim the hex back to one
+    # digit per 4 bits so odd hash sizes keep their previous length.
+    return np.packbits(bits).tobytes().hex()[: (bits.size + 3) // 4]
@@ -2,6 +2,11 @@ import json
 import logging
 from typing import Any, Dict
 
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder.
+    orjson = None
+
 
 def get_logger(name: str = "vlm_nav") -> logging.Logger:
     logger = logging.getLogger(name)
@@ -18,4 +23,7 @@ def get_logger(name: str = "vlm_nav") -> logging.Logger:
 
 def log_event(logger: logging.Logger, event: str, **fields: Any) -> None:
     payload: Dict[str, Any] = {"event": event, **fields}
-    logger.info(json.dumps(payload, ensure_ascii=True))
+    if orjson is not None:
+        logger.info(orjson.dumps(payload).decode("utf-8"))
+    else:
+        logger.info(json.dumps(payload, ensure_ascii=True))
@@ -2,30 +2,80 @@ from __future__ import annotations
 
 import json
 import os
-from dataclasses import dataclass
-from datetime import datetime
-from typing import Any, Dict
+import queue
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder.
+    orjson = None
 
 
 @dataclass
 class TraceWriter:
     run_dir: str
+    _prefix: str = field(init=False, repr=False)
+    _queue: "queue.Queue[Optional[Tuple[str, bytes]]]" = field(init=False, repr=False)
+    _worker: threading.Thread = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self._prefix = os.path.join(self.run_dir, "")
+        # Saves return as soon as the bytes are queued; a daemon thread does the
+        # actual file I/O. Call close() when the run ends.
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._drain, name="trace-writer", daemon=True)
+        self._worker.start()
 
     @staticmethod
     def create(base_dir: str = "runs") -> "TraceWriter":
-        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+        timestamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
         run_dir = os.path.join(base_dir, timestamp)
         os.makedirs(run_dir, exist_ok=True)
         return TraceWriter(run_dir=run_dir)
 
-    def save_image(self, step: int, png_bytes: bytes) -> str:
-        path = os.path.join(self.run_dir, f"step_{step:02d}.png")
-        with open(path, "wb") as f:
-            f.write(png_bytes)
+    def image_path(self, step: int) -> str:
+        return f"{self._prefix}step_{step:02d}.jpg"
+
+    def json_path(self, step: int, suffix: str) -> str:
+        return f"{self._prefix}step_{step:02d}_{suffix}.json"
+
+    def save_image(self, step: int, image_bytes: bytes) -> str:
+        path = self.image_path(step)
+        self._queue.put((path, image_bytes))
         return path
 
     def save_json(self, step: int, suffix: str, data: Dict[str, Any]) -> str:
-        path = os.path.join(self.run_dir, f"step_{step:02d}_{suffix}.json")
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=True, indent=2)
+        path = self.json_path(step, suffix)
+        # Serialize now so later mutations of `data` can't leak into the trace.
+        if orjson is not None:
+            payload = orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+        else:
+            payload = json.dumps(data, ensure_ascii=True, indent=2).encode("utf-8")
+        self._queue.put((path, payload))
         return path
+
+    def flush(self) -> None:
+        self._queue.join()
+
+    def close(self) -> None:
+        # Writes queued so far are drained before the sentinel stops the worker.
+        if self._worker.is_alive():
+            self._queue.put(None)
+            self._worker.join()
+
+    def _drain(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                path, data = item
+                with open(path, "wb") as f:
+                    f.write(data)
+            except Exception:
+                pass  # traces are best effort; never take the run down
+            finally:
+                self._queue.task_done()